@@ -5,21 +5,36 @@ Flask API + WebSocket streaming for MAVSDK drone telemetry.
 Serves a RapiDoc UI at /docs.
 """
 
-import asyncio
-import json
 import os
+
+from dotenv import load_dotenv
+
+load_dotenv()  # load .env before reading config
+
+# Under gevent every WebSocket client is a greenlet instead of an OS
+# thread; the stdlib must be patched before anything else imports it.
+HELIOS_SERVER = os.getenv("HELIOS_SERVER", "werkzeug").lower()  # "werkzeug" or "gevent"
+if HELIOS_SERVER == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+
+import _thread
+import asyncio
+import hashlib
 import socket
 import threading
 import time
+from collections import deque
 from datetime import datetime, timezone
+from itertools import combinations
+from operator import itemgetter
+from types import MappingProxyType
 
-from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, Response
+import orjson
+from flask import Flask, render_template, request, Response
 from flask_cors import CORS
 from flask_sock import Sock
 
-load_dotenv()  # load .env before reading config
-
 # ═══════════════════════════════════════════════════════════════
 #  Configuration
 # ═══════════════════════════════════════════════════════════════
@@ -28,19 +43,43 @@ DRONE_TYPE = os.getenv("DRONE_TYPE", "mavsdk").lower()  # "mavsdk" or "dji"
 DRONE_ADDRESS = os.getenv("DRONE_ADDRESS", "udpin://0.0.0.0:14551")
 DJI_SOCK_PATH = os.getenv("DJI_SOCK_PATH", "/tmp/helios-dji-telemetry.sock")
 DJI_RECONNECT_S = float(os.getenv("DJI_RECONNECT_S", "2"))
+DJI_READ_BUFFER = int(os.getenv("DJI_READ_BUFFER", "65536"))  # socket read buffer (bytes)
 TIMEOUT = int(os.getenv("CONNECT_TIMEOUT", "30"))
 WS_RATE_HZ = float(os.getenv("WS_RATE_HZ", "10"))  # WebSocket push rate
 TELEM_RATE_HZ = float(os.getenv("TELEM_RATE_HZ", "2"))  # telemetry request rate
+WS_BATCH_SIZE = int(os.getenv("WS_BATCH_SIZE", "1"))  # frames per WS message (1 = no batching)
+WS_BATCH_MS = float(os.getenv("WS_BATCH_MS", "500"))  # max age of a partial batch
+WS_BURST = float(os.getenv("WS_BURST", "2"))  # per-client burst above WS_RATE_HZ
+WS_DRAIN_MAX = max(1, int(os.getenv("WS_DRAIN_MAX", "32")))  # most snapshots in one drained WS message
+WS_COMPRESSION = os.getenv("WS_COMPRESSION", "1") != "0"  # permessage-deflate when offered
+WS_SKIP_UNCHANGED = os.getenv("WS_SKIP_UNCHANGED", "1") != "0"  # skip frames whose subscribed values repeat
+WS_PING_S = float(os.getenv("WS_PING_S", "25"))  # WS keepalive ping interval (0 = off)
 
 # ═══════════════════════════════════════════════════════════════
 #  Shared telemetry state  (written by bg thread, read by Flask)
 # ═══════════════════════════════════════════════════════════════
 
-_lock = threading.Lock()
-_state = {
-    "connected": False,
-    "connecting": True,
-    "started_at": None,
+# Connection status lives in plain module globals: each is a single
+# store from the backend thread (atomic under the GIL) and no invariant
+# spans them, so /api/status reads them without any lock and status
+# changes never republish the telemetry snapshot.
+_connected = False
+_connecting = True
+_started_at = None
+
+
+def _set_connection(connected, connecting):
+    """Record the backend link state; stamps started_at on (re)connect."""
+    global _connected, _connecting, _started_at
+    if connected and not _connected:
+        _started_at = _utc_now_iso()
+    _connected = connected
+    _connecting = connecting
+
+
+# The initial snapshot.  Section dicts are never mutated after
+# publication, only replaced.
+_EMPTY_STATE = MappingProxyType({
     "position": {
         "latitude_deg": None,
         "longitude_deg": None,
@@ -56,33 +95,147 @@ _state = {
         "voltage_v": None,
         "remaining_percent": None,
     },
-    "last_updated": None,
-}
+    "updated_ns": None,  # epoch ns of the last publish; formatted by readers
+    "version": 0,  # bumped on every publish; backs the REST ETags
+})
+_write_lock = _thread.allocate_lock()  # serializes writers only; readers never lock
+
+# WS subscription shapes are tuples of these, in this canonical order.
+_WS_SECTIONS = ("position", "attitude", "battery")
+
+_ts_cache = (0, "")  # (epoch ms, ISO-8601 string) of the last formatted time
+
+
+def _iso_from_ns(ns):
+    """Epoch ns as UTC ISO-8601 (None passes through), memoized per millisecond."""
+    global _ts_cache
+    if ns is None:
+        return None
+    ms = ns // 1_000_000
+    cached_ms, iso = _ts_cache
+    if ms != cached_ms:
+        dt = datetime.fromtimestamp(ms // 1000, timezone.utc)
+        iso = dt.replace(microsecond=ms % 1000 * 1000).isoformat(timespec="milliseconds")
+        _ts_cache = (ms, iso)
+    return iso
+
+
+def _utc_now_iso():
+    return _iso_from_ns(time.time_ns())
 
 
-def _get_snapshot(*keys):
-    """Return a (deep-)copy of selected top-level keys, or the full state."""
-    with _lock:
-        if keys:
-            return {k: _state[k] for k in keys if k in _state}
-        return {**_state}
+def _make_builder(shape):
+    """Compile the payload splice for one subscription shape.
+
+    The JSON skeleton and section lookups are fixed up front, so building
+    a payload is one itemgetter call and one %-format.
+    """
+    template = '{%s,"last_updated":%%s}' % ",".join(['"%s":%%s' % s for s in shape])
+    if len(shape) == 1:
+        (section,) = shape
+        return lambda parts, ts: template % (parts[section], ts)
+    get = itemgetter(*shape)
+    return lambda parts, ts: template % (*get(parts), ts)
+
+
+# Payload builder for every subscription shape.
+_WS_BUILDERS = {shape: _make_builder(shape)
+                for n in range(1, len(_WS_SECTIONS) + 1)
+                for shape in combinations(_WS_SECTIONS, n)}
+
+
+class _Payloads(dict):
+    """A snapshot's WS payloads, keyed by subscription shape.
+
+    Each section is encoded once up front, or carried over from the
+    previous payloads when it was not replaced; a shape's payload is
+    spliced from those JSON fragments the first time a client asks for it.
+    """
+
+    __slots__ = ("parts", "updated_ns", "ts")
+
+    def __init__(self, snap, prev=None, changed=_WS_SECTIONS):
+        super().__init__()
+        self.parts = {
+            s: orjson.dumps(snap[s]).decode() if prev is None or s in changed else prev.parts[s]
+            for s in _WS_SECTIONS
+        }
+        self.updated_ns = snap["updated_ns"]
+        self.ts = None  # JSON timestamp, formatted with the first payload
+
+    def __missing__(self, shape):
+        # Racing senders may both splice; they build the same string.
+        if self.ts is None:
+            self.ts = orjson.dumps(_iso_from_ns(self.updated_ns)).decode()
+        payload = _WS_BUILDERS[shape](self.parts, self.ts)
+        self[shape] = payload
+        return payload
+
+
+# The current (snapshot, WS payloads) pair, published as one tuple so
+# readers grab both with a single lock-free load and never see them out
+# of step; writers swap in a replacement.  Payloads are pre-serialized
+# so each publish is encoded once no matter how many clients are
+# connected.
+_published = (_EMPTY_STATE, _Payloads(_EMPTY_STATE))
+# Recent published pairs, for clients that drain every snapshot.
+_history = deque([_published], maxlen=WS_DRAIN_MAX)
+
+# WebSocket clients sleep on this until something is published.
+_publish_cv = threading.Condition()
+
+
+def _wake_ws_clients():
+    with _publish_cv:
+        _publish_cv.notify_all()
 
 
 def _patch(**kwargs):
-    """Thread-safe update of one or more top-level keys."""
-    with _lock:
-        _state.update(kwargs)
-        _state["last_updated"] = datetime.now(timezone.utc).isoformat()
+    """Publish a new snapshot with one or more top-level keys replaced."""
+    global _published
+    with _write_lock:
+        old = _published[0]
+        snap = MappingProxyType({
+            **old,
+            **kwargs,
+            "updated_ns": time.time_ns(),
+            "version": old["version"] + 1,
+        })
+        _published = (snap, _Payloads(snap, _published[1], kwargs))
+        _history.append(_published)
+    _wake_ws_clients()
 
 
 # ═══════════════════════════════════════════════════════════════
 #  Backend: MAVSDK
 # ═══════════════════════════════════════════════════════════════
 
+def _gevent_hub():
+    """The calling thread's gevent hub if the stdlib is patched, else None."""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:  # gevent is only needed by the gevent server modes
+        return None
+    return get_hub() if monkey.is_module_patched("threading") else None
+
+
 def _start_mavsdk_backend():
     """Import mavsdk, connect, and stream telemetry (runs in daemon thread)."""
     from mavsdk import System
 
+    # MAVSDK talks to mavsdk_server over grpc.aio, which is not
+    # gevent-safe: inside a greenlet one blocking poll would freeze the
+    # hub, and every request with it.  Under gevent the loop therefore
+    # runs on a real OS thread and hands each publish to the hub.
+    hub = _gevent_hub()
+    if hub is None:
+        publish = _patch
+    else:
+        import gevent
+
+        def publish(**updates):
+            hub.loop.run_callback_threadsafe(lambda: gevent.spawn(_patch, **updates))
+
     async def _telemetry_loop():
         drone = System()
         await drone.connect(system_address=DRONE_ADDRESS)
@@ -98,7 +251,7 @@ def _start_mavsdk_backend():
         try:
             await asyncio.wait_for(_wait_for_connection(), timeout=TIMEOUT)
         except asyncio.TimeoutError:
-            _patch(connected=False, connecting=False)
+            _set_connection(False, False)
             print(f"[helios] ✗ No heartbeat received after {TIMEOUT}s.")
             print("  Troubleshooting:")
             if DRONE_ADDRESS.startswith("serial"):
@@ -112,7 +265,7 @@ def _start_mavsdk_backend():
                 print("  3. Make sure your drone/SITL is connected to Mission Planner first")
             return
 
-        _patch(connected=True, connecting=False, started_at=datetime.now(timezone.utc).isoformat())
+        _set_connection(True, False)
         print("[helios] ✓ Connected — requesting telemetry rates")
 
         tel = drone.telemetry
@@ -133,43 +286,72 @@ def _start_mavsdk_backend():
         await asyncio.sleep(2)
         print("[helios] ✓ Streaming telemetry")
 
-        async def _stream_position():
-            async for pos in drone.telemetry.position():
-                _patch(position={
-                    "latitude_deg": round(pos.latitude_deg, 7),
-                    "longitude_deg": round(pos.longitude_deg, 7),
-                    "absolute_altitude_m": round(pos.absolute_altitude_m, 2),
-                    "relative_altitude_m": round(pos.relative_altitude_m, 2),
-                })
-
-        async def _stream_attitude():
-            async for att in drone.telemetry.attitude_euler():
-                _patch(attitude={
-                    "roll_deg": round(att.roll_deg, 2),
-                    "pitch_deg": round(att.pitch_deg, 2),
-                    "yaw_deg": round(att.yaw_deg, 2),
-                })
-
-        async def _stream_battery():
-            async for bat in drone.telemetry.battery():
-                _patch(battery={
-                    "voltage_v": round(bat.voltage_v, 2),
-                    "remaining_percent": round(bat.remaining_percent, 4),
-                })
+        # Streams park the raw MAVSDK reading in a pending slot; one
+        # publisher coalesces bursts into a single _patch per window, and
+        # only readings still current at that point are turned into dicts.
+        def _position_dict(pos):
+            return {
+                "latitude_deg": pos.latitude_deg,
+                "longitude_deg": pos.longitude_deg,
+                "absolute_altitude_m": pos.absolute_altitude_m,
+                "relative_altitude_m": pos.relative_altitude_m,
+            }
+
+        def _attitude_dict(att):
+            return {
+                "roll_deg": att.roll_deg,
+                "pitch_deg": att.pitch_deg,
+                "yaw_deg": att.yaw_deg,
+            }
 
+        def _battery_dict(bat):
+            return {
+                "voltage_v": bat.voltage_v,
+                "remaining_percent": bat.remaining_percent,
+            }
+
+        to_dict = {
+            "position": _position_dict,
+            "attitude": _attitude_dict,
+            "battery": _battery_dict,
+        }
+        pending = {}
+        dirty = asyncio.Event()
+        publish_window = 0.5 / TELEM_RATE_HZ
+
+        async def _publisher():
+            while True:
+                await dirty.wait()
+                await asyncio.sleep(publish_window)
+                dirty.clear()
+                updates = {k: to_dict[k](v) for k, v in pending.items()}
+                pending.clear()
+                publish(**updates)
+
+        async def _pump(section, stream):
+            """Park each reading from a MAVSDK stream in its section's slot."""
+            async for reading in stream:
+                pending[section] = reading
+                dirty.set()
+
+        telemetry = drone.telemetry
         await asyncio.gather(
-            _stream_position(),
-            _stream_attitude(),
-            _stream_battery(),
+            _publisher(),
+            _pump("position", telemetry.position()),
+            _pump("attitude", telemetry.attitude_euler()),
+            _pump("battery", telemetry.battery()),
         )
 
-    def _run():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(_telemetry_loop())
-
-    t = threading.Thread(target=_run, daemon=True, name="helios-mavsdk")
-    t.start()
+    # asyncio.run owns the loop: it closes it and finalizes async
+    # generators when the telemetry loop gives up (e.g. no heartbeat).
+    if hub is None:
+        t = threading.Thread(target=asyncio.run, args=(_telemetry_loop(),),
+                             daemon=True, name="helios-mavsdk")
+        t.start()
+    else:
+        from gevent import monkey
+        start_new_thread = monkey.get_original("_thread", "start_new_thread")
+        start_new_thread(asyncio.run, (_telemetry_loop(),))
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -179,64 +361,104 @@ def _start_mavsdk_backend():
 def _start_dji_backend():
     """Connect to telemetry-monitor Unix socket and read JSON lines."""
 
-    def _apply_frame(data: dict):
-        updates = {}
-        pos = data.get("position")
-        if pos:
-            updates["position"] = {
-                "latitude_deg": pos.get("latitude_deg"),
-                "longitude_deg": pos.get("longitude_deg"),
-                "absolute_altitude_m": pos.get("absolute_altitude_m"),
-                "relative_altitude_m": pos.get("relative_altitude_m"),
-            }
-        att = data.get("attitude")
-        if att:
-            updates["attitude"] = {
-                "roll_deg": att.get("roll_deg"),
-                "pitch_deg": att.get("pitch_deg"),
-                "yaw_deg": att.get("yaw_deg"),
-            }
-        bat = data.get("battery")
-        if bat:
-            updates["battery"] = {
-                "voltage_v": bat.get("voltage_v"),
-                "remaining_percent": bat.get("remaining_percent"),
-            }
-        if updates:
-            _patch(**updates)
+    # One receive buffer for the life of the process, reused across
+    # reconnects so a flapping link does not churn the allocator.
+    buf = bytearray(DJI_READ_BUFFER)
+    view = memoryview(buf)
+
+    def _read_batches(s):
+        """Yield the complete lines of each read as views into the buffer.
+
+        The views are only valid until the next batch is requested.
+        """
+        start = end = 0
+        overflow = False  # dropping a line longer than the buffer
+        while True:
+            if end == len(buf):
+                if start == 0:
+                    overflow, end = True, 0
+                else:
+                    buf[:end - start] = buf[start:end]
+                    end -= start
+                    start = 0
+            n = s.recv_into(view[end:])
+            if not n:
+                return
+            end += n
+            lines = []
+            idx = buf.find(b"\n", start, end)
+            while idx >= 0:
+                if not overflow:
+                    lines.append(view[start:idx])
+                overflow = False
+                start = idx + 1
+                idx = buf.find(b"\n", start, end)
+            if lines:
+                yield lines
+            if start == end:
+                start = end = 0
+
+    def _position_dict(pos):
+        return {
+            "latitude_deg": pos.get("latitude_deg"),
+            "longitude_deg": pos.get("longitude_deg"),
+            "absolute_altitude_m": pos.get("absolute_altitude_m"),
+            "relative_altitude_m": pos.get("relative_altitude_m"),
+        }
+
+    def _attitude_dict(att):
+        return {
+            "roll_deg": att.get("roll_deg"),
+            "pitch_deg": att.get("pitch_deg"),
+            "yaw_deg": att.get("yaw_deg"),
+        }
+
+    def _battery_dict(bat):
+        return {
+            "voltage_v": bat.get("voltage_v"),
+            "remaining_percent": bat.get("remaining_percent"),
+        }
+
+    to_dict = {
+        "position": _position_dict,
+        "attitude": _attitude_dict,
+        "battery": _battery_dict,
+    }
+
+    def _apply_frames(lines):
+        """Publish the frames of one read as a single _patch, latest wins."""
+        latest = {}
+        for line in lines:
+            try:
+                data = orjson.loads(line)  # blank lines fail to parse too
+            except ValueError:  # bad JSON or bad UTF-8
+                continue
+            if not isinstance(data, dict):
+                continue
+            for key in to_dict:
+                section = data.get(key)
+                if section and isinstance(section, dict):
+                    latest[key] = section
+        if latest:
+            _patch(**{k: to_dict[k](v) for k, v in latest.items()})
 
     def _run():
-        buf = b""
         while True:
             try:
-                _patch(connecting=True, connected=False)
+                _set_connection(False, True)
                 s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
                 s.connect(DJI_SOCK_PATH)
                 s.settimeout(5.0)
-                _patch(connecting=False, connected=True,
-                       started_at=datetime.now(timezone.utc).isoformat())
+                _set_connection(True, False)
                 print(f"[dji] Connected to {DJI_SOCK_PATH}")
-                buf = b""
-
-                while True:
-                    chunk = s.recv(4096)
-                    if not chunk:
-                        raise ConnectionError("socket closed")
-                    buf += chunk
-                    while b"\n" in buf:
-                        line, buf = buf.split(b"\n", 1)
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            data = json.loads(line)
-                        except json.JSONDecodeError:
-                            continue
-                        _apply_frame(data)
+
+                for lines in _read_batches(s):
+                    _apply_frames(lines)
+                raise ConnectionError("socket closed")
 
             except (ConnectionError, OSError, socket.timeout) as exc:
                 print(f"[dji] Connection lost ({exc}), reconnecting in {DJI_RECONNECT_S}s...")
-                _patch(connecting=False, connected=False)
+                _set_connection(False, False)
                 try:
                     s.close()
                 except Exception:
@@ -251,7 +473,15 @@ def _start_dji_backend():
 #  Start the selected backend
 # ═══════════════════════════════════════════════════════════════
 
+_backend_started = False
+
+
 def _start_telemetry_thread():
+    """Start the configured backend once per process; later calls are no-ops."""
+    global _backend_started
+    if _backend_started:
+        return
+    _backend_started = True
     if DRONE_TYPE == "dji":
         print(f"[helios] Backend: DJI — reading from {DJI_SOCK_PATH}")
         _start_dji_backend()
@@ -266,9 +496,63 @@ def _start_telemetry_thread():
 
 app = Flask(__name__)
 CORS(app)
+# Idle subscribers get protocol-level pings instead of repeated snapshots;
+# a client that stops answering them is disconnected.
+app.config["SOCK_SERVER_OPTIONS"] = {"ping_interval": WS_PING_S or None}
 sock = Sock(app)
 
 
+def _json_response(obj):
+    """Encode straight to a bytes body, bypassing Flask's JSON provider."""
+    return Response(orjson.dumps(obj), mimetype="application/json")
+
+
+def _revalidated(etag, cache_control, make_response):
+    """Return make_response() tagged with etag, or a bare 304 if the client has it."""
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+    else:
+        resp = make_response()
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+
+# ETags are "<boot>-<version>" so a restart never matches a stale tag.
+_ETAG_BOOT = format(time.time_ns(), "x")
+
+
+def _conditional_json(build):
+    """Return build(snapshot) as JSON, or 304 if the client's ETag is current."""
+    snap = _published[0]
+    return _revalidated(
+        f"{_ETAG_BOOT}-{snap['version']}", "no-cache",
+        lambda: _json_response(build(snap)),
+    )
+
+
+# One fixed-shape projection per route, rather than a generic key loop.
+def _snap_all(s):
+    return {
+        "position": s["position"],
+        "attitude": s["attitude"],
+        "battery": s["battery"],
+        "last_updated": _iso_from_ns(s["updated_ns"]),
+    }
+
+
+def _snap_position(s):
+    return {"position": s["position"]}
+
+
+def _snap_attitude(s):
+    return {"attitude": s["attitude"]}
+
+
+def _snap_battery(s):
+    return {"battery": s["battery"]}
+
+
 # ── Documentation UI ────────────────────────────────────────
 @app.route("/docs")
 def docs():
@@ -278,90 +562,239 @@ def docs():
 # ── OpenAPI spec ────────────────────────────────────────────
 @app.route("/openapi.json")
 def openapi_spec():
-    spec = _build_openapi_spec()
-    return Response(
-        json.dumps(spec, indent=2),
-        mimetype="application/json",
+    return _revalidated(
+        _OPENAPI_ETAG, "public, max-age=3600",
+        lambda: Response(_OPENAPI_JSON, mimetype="application/json"),
     )
 
 
 # ── REST: full telemetry snapshot ───────────────────────────
 @app.route("/api/telemetry")
 def api_telemetry():
-    snap = _get_snapshot("position", "attitude", "battery", "last_updated")
-    return jsonify(snap)
+    return _conditional_json(_snap_all)
 
 
 # ── REST: position only ────────────────────────────────────
 @app.route("/api/telemetry/position")
 def api_position():
-    return jsonify(_get_snapshot("position"))
+    return _conditional_json(_snap_position)
 
 
 # ── REST: attitude only ────────────────────────────────────
 @app.route("/api/telemetry/attitude")
 def api_attitude():
-    return jsonify(_get_snapshot("attitude"))
+    return _conditional_json(_snap_attitude)
 
 
 # ── REST: battery only ─────────────────────────────────────
 @app.route("/api/telemetry/battery")
 def api_battery():
-    return jsonify(_get_snapshot("battery"))
+    return _conditional_json(_snap_battery)
 
 
 # ── REST: connection status ─────────────────────────────────
 @app.route("/api/status")
 def api_status():
-    snap = _get_snapshot("connected", "connecting", "started_at", "last_updated")
+    snap = {
+        "connected": _connected,
+        "connecting": _connecting,
+        "started_at": _started_at,
+        "last_updated": _iso_from_ns(_published[0]["updated_ns"]),
+    }
     snap["backend"] = DRONE_TYPE
     snap["drone_address"] = DRONE_ADDRESS if DRONE_TYPE == "mavsdk" else DJI_SOCK_PATH
     snap["ws_rate_hz"] = WS_RATE_HZ
-    return jsonify(snap)
+    return _json_response(snap)
 
 
 # ── WebSocket: live telemetry stream ────────────────────────
+class _TokenBucket:
+    """Allow `rate` events per second, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def wait_time(self):
+        """Seconds until a token is available (0.0 if one is now)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+def _ws_fields(subs):
+    """Subscription list → canonical section tuple, or None for everything."""
+    if "all" in subs:
+        return None
+    # Canonical order, so it doubles as the payload key
+    fields = tuple(s for s in _WS_SECTIONS if s in subs)
+    return fields if fields and fields != _WS_SECTIONS else None
+
+
+def _ws_reader(ws, sub):
+    """Apply subscribe/batch messages from a client until it disconnects."""
+    # Every message is applied, so the latest setting always wins; only
+    # the sender wake-ups are rate limited, so a client flooding control
+    # messages cannot keep waking every sender.  A wake that is due but
+    # out of tokens fires once a token frees up, even if the client has
+    # gone quiet by then.
+    bucket = _TokenBucket(WS_RATE_HZ, WS_BURST)
+    wake_due = False
+    while True:
+        try:
+            # blocks; returns None on timeout, raises once the socket is closed
+            msg = ws.receive(bucket.wait_time() if wake_due else None)
+        except Exception:
+            _wake_ws_clients()  # let the sender notice the disconnect
+            return
+        if msg is not None:
+            wake_due = True
+            try:
+                payload = orjson.loads(msg)
+                if "subscribe" in payload:
+                    sub["fields"] = _ws_fields(payload["subscribe"])
+                if "batch" in payload:
+                    batch = payload["batch"]
+                    drain = batch is True
+                    size = 1 if drain else max(1, int(batch))  # validate first
+                    sub["drain"], sub["batch"] = drain, size
+            except (TypeError, ValueError):  # orjson.JSONDecodeError is a ValueError
+                pass
+        if wake_due and bucket.wait_time() == 0:
+            bucket.take()
+            wake_due = False
+            _wake_ws_clients()
+
+
+@app.before_request
+def _negotiate_ws_compression():
+    """Decline permessage-deflate by hiding the client's extension offer.
+
+    Compression is settled in the handshake, so it goes by the
+    subscription in the ?subscribe= query: only full snapshots are big
+    enough to gain from it.
+    """
+    if request.path != "/ws/telemetry":
+        return
+    if not WS_COMPRESSION or _ws_fields(request.args.get("subscribe", "all").split(",")):
+        request.environ.pop("HTTP_SEC_WEBSOCKET_EXTENSIONS", None)
+
+
 @sock.route("/ws/telemetry")
 def ws_telemetry(ws):
     """
-    Push the latest telemetry snapshot to the client at WS_RATE_HZ.
-    The client may send a JSON message to filter fields:
+    Push each new telemetry snapshot to the client, at most WS_RATE_HZ
+    times a second (bursts of WS_BURST); the loop sleeps while nothing is
+    published and always sends the latest snapshot, so a slow client
+    never builds a backlog.
+    The initial fields may be chosen in the URL, which also decides
+    compression (see _negotiate_ws_compression):
+        /ws/telemetry?subscribe=position,battery
+    and the client may send a JSON message to filter fields:
         {"subscribe": ["position"]}           — only position
         {"subscribe": ["attitude", "battery"]} — attitude + battery
         {"subscribe": ["all"]}                 — everything (default)
+    and/or to batch several snapshots into one JSON-array message:
+        {"batch": 5}                           — up to 5 frames per message
+        {"batch": 1}                           — one frame per message
+        {"batch": true}                        — every snapshot published
+                                                 since the last message
+    Incoming messages are handled by a reader thread, so this loop only
+    publishes.
     """
-    interval = 1.0 / WS_RATE_HZ
-    fields = None  # None = send everything
-
-    while True:
-        # ── Check for incoming filter messages (non-blocking) ──
-        try:
-            msg = ws.receive(timeout=0)
-            if msg:
-                try:
-                    payload = json.loads(msg)
-                    subs = payload.get("subscribe", ["all"])
-                    if "all" in subs:
-                        fields = None
-                    else:
-                        fields = [s for s in subs if s in ("position", "attitude", "battery")]
-                except (json.JSONDecodeError, AttributeError):
-                    pass
-        except Exception:
-            pass
+    bucket = _TokenBucket(WS_RATE_HZ, WS_BURST)
+    sub = {  # fields None = everything
+        "fields": _ws_fields(request.args.get("subscribe", "all").split(",")),
+        "batch": WS_BATCH_SIZE,
+        "drain": False,
+    }
+    frames = []
+    batch_started = 0.0
+    last_published = last_fields = last_sections = None
+    last_version = _published[0]["version"] - 1  # a drain starts from the current snapshot
 
-        # ── Build & send snapshot ──────────────────────────────
-        if fields:
-            snap = _get_snapshot(*fields, "last_updated")
-        else:
-            snap = _get_snapshot("position", "attitude", "battery", "last_updated")
+    threading.Thread(target=_ws_reader, args=(ws, sub), daemon=True,
+                     name="helios-ws-reader").start()
 
-        try:
-            ws.send(json.dumps(snap))
-        except Exception:
-            break  # client disconnected
+    def _has_news():
+        return (not ws.connected or _published is not last_published
+                or sub["fields"] != last_fields)
 
-        time.sleep(interval)
+    while True:
+        # ── Wait for a send token, then for a publish ──────────
+        delay = bucket.wait_time()
+        if delay > 0:
+            time.sleep(delay)
+        timeout = None  # a pending batch must still flush on age
+        if frames:
+            timeout = max(0.0, batch_started + WS_BATCH_MS / 1000 - time.monotonic())
+        with _publish_cv:
+            _publish_cv.wait_for(_has_news, timeout)
+        if not ws.connected:
+            break
+
+        fields = sub["fields"]
+        batch_size = sub["batch"]
+        published = _published
+        snap, payloads = published
+
+        # ── Pick the pre-serialized snapshot(s), if anything changed ──
+        new = []
+        key = fields or _WS_SECTIONS
+        sections = None
+        if published is not last_published:
+            # Same fragments as last time means same values; only the
+            # timestamp moved, so the frame is not worth sending.
+            sections = [payloads.parts[s] for s in key]
+            if (WS_SKIP_UNCHANGED and not sub["drain"] and fields == last_fields
+                    and sections == last_sections):
+                last_published = published
+                last_version = snap["version"]
+        if published is not last_published or fields != last_fields:
+            last_published, last_fields = published, fields
+            last_sections = sections or [payloads.parts[s] for s in key]
+            bucket.take()  # one token per frame or drained message
+            backlog = []
+            if sub["drain"]:
+                # Everything published since the last send, oldest first
+                backlog = [(s, p) for s, p in tuple(_history) if s["version"] > last_version]
+            if backlog:
+                new = [p[key] for _, p in backlog]
+                last_version = backlog[-1][0]["version"]
+            else:
+                new = [payloads[key]]
+                last_version = snap["version"]
+
+        # ── Batch frames, flushing on size or age ──────────────
+        out = None
+        if batch_size > 1:
+            if new:
+                if not frames:
+                    batch_started = time.monotonic()
+                frames.extend(new)
+            if frames and (len(frames) >= batch_size
+                           or (time.monotonic() - batch_started) * 1000 >= WS_BATCH_MS):
+                out = "[" + ",".join(frames) + "]"
+                frames = []
+        else:  # also flushes a batch left over when batching was switched off
+            frames.extend(new)
+            if len(frames) == 1:
+                out = frames[0]
+            elif frames:
+                out = "[" + ",".join(frames) + "]"
+            frames = []
+
+        if out is not None:
+            try:
+                ws.send(out)
+            except Exception:
+                break  # client disconnected
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -393,6 +826,7 @@ def _build_openapi_spec():
             "remaining_percent":  {"type": "number", "example": 0.87},
         },
     }
+    not_modified = {"description": "Unchanged since the ETag sent in If-None-Match"}
 
     return {
         "openapi": "3.0.3",
@@ -411,7 +845,26 @@ def _build_openapi_spec():
                 "```json\n"
                 '{"subscribe": ["position"]}\n'
                 "```\n"
-                "Valid field names: `position`, `attitude`, `battery`, `all` (default)."
+                "Valid field names: `position`, `attitude`, `battery`, `all` (default).\n\n"
+                "The initial fields can also be given in the URL, "
+                "`ws://<host>/ws/telemetry?subscribe=position,battery`. "
+                "permessage-deflate compression is only negotiated for connections "
+                "that start out subscribed to `all`; small subset payloads gain "
+                "little from it.\n\n"
+                "A snapshot whose subscribed fields hold the same values as the "
+                "last frame sent is skipped (unless `WS_SKIP_UNCHANGED=0`), so a "
+                "parked drone produces no traffic; the connection is kept alive "
+                "with protocol pings.\n\n"
+                "### Batching\n"
+                "To receive several snapshots per message as a JSON array, send:\n"
+                "```json\n"
+                '{"batch": 5}\n'
+                "```\n"
+                "A batch is flushed when it is full or after `WS_BATCH_MS`. "
+                "Send `{\"batch\": 1}` to go back to one object per message.\n\n"
+                "Send `{\"batch\": true}` to receive every snapshot: whatever was "
+                "published since the last message arrives together, as an array "
+                "when there is more than one (at most `WS_DRAIN_MAX`)."
             ),
             "contact": {"name": "Helios Aerospace", "url": "https://helios.aero"},
         },
@@ -446,6 +899,7 @@ def _build_openapi_spec():
                                 },
                             },
                         },
+                        "304": not_modified,
                     },
                 },
             },
@@ -467,6 +921,7 @@ def _build_openapi_spec():
                                 },
                             },
                         },
+                        "304": not_modified,
                     },
                 },
             },
@@ -488,6 +943,7 @@ def _build_openapi_spec():
                                 },
                             },
                         },
+                        "304": not_modified,
                     },
                 },
             },
@@ -509,6 +965,7 @@ def _build_openapi_spec():
                                 },
                             },
                         },
+                        "304": not_modified,
                     },
                 },
             },
@@ -544,6 +1001,11 @@ def _build_openapi_spec():
     }
 
 
+# The spec is static per process: build and serialize it once.
+_OPENAPI_JSON = orjson.dumps(_build_openapi_spec(), option=orjson.OPT_INDENT_2)
+_OPENAPI_ETAG = hashlib.md5(_OPENAPI_JSON, usedforsecurity=False).hexdigest()
+
+
 # ═══════════════════════════════════════════════════════════════
 #  Entry point
 # ═══════════════════════════════════════════════════════════════
@@ -558,4 +1020,9 @@ if __name__ == "__main__":
     print(f"[helios] Docs UI → http://{host}:{port}/docs")
     print(f"[helios] WebSocket → ws://{host}:{port}/ws/telemetry\n")
 
-    app.run(host=host, port=port, debug=False)
+    if HELIOS_SERVER == "gevent":
+        from gevent.pywsgi import WSGIServer
+        print("[helios] Server: gevent")
+        WSGIServer((host, port), app, log=None).serve_forever()
+    else:
+        app.run(host=host, port=port, debug=False)
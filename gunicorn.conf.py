@@ -0,0 +1,30 @@
+"""
+Gunicorn configuration for production deployments.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Runs one gevent worker: WebSocket clients are greenlets (a few KB each)
+instead of OS threads, so one SBC can hold ~1000 live connections.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}"
+worker_class = "gevent"
+# Telemetry state lives in the worker process, so exactly one worker
+# owns the drone connection; more workers would each dial the drone and
+# serve diverging state.  Concurrency comes from gevent, not processes.
+workers = 1
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+
+
+def post_worker_init(worker):
+    # gevent has patched the stdlib by now: the DJI reader runs as a
+    # greenlet, while the MAVSDK loop, whose gRPC client is not
+    # gevent-safe, gets its own OS thread.
+    from app import _start_telemetry_thread
+    _start_telemetry_thread()
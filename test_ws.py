@@ -8,22 +8,74 @@ Usage:
     python test_ws.py --fields position      # position only
     python test_ws.py --fields attitude battery
     python test_ws.py --host 192.168.1.50 --port 5000
+    python test_ws.py --batch 5              # 5 frames per WebSocket message
+    python test_ws.py --drain                # every snapshot, bursts batched
+    python test_ws.py --quiet                # throughput only, for load tests
 
-Requires: websocket-client  (pip install websocket-client)
+Requires: websocket-client, orjson  (pip install websocket-client orjson)
 """
 
 import argparse
-import json
 import sys
 import time
 
 try:
+    import orjson
     from websocket import create_connection, WebSocketException
 except ImportError:
-    print("Missing dependency.  Install it with:\n  pip install websocket-client")
+    print("Missing dependency.  Install it with:\n  pip install websocket-client orjson")
     sys.exit(1)
 
 
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _fmt(value, spec, unit=""):
+    """Format a telemetry number for display; the server sends full precision.
+
+    Anything that is not a number is printed as-is, since the DJI backend
+    passes monitor values through unvalidated.
+    """
+    if value is None:
+        return "—"
+    if _is_number(value):
+        return format(value, spec) + unit
+    return str(value) + unit
+
+
+def _format_frame(count, data):
+    """Render one telemetry frame as a block of text."""
+    ts = data.get("last_updated", "—")
+    parts = []
+
+    if "position" in data:
+        p = data["position"]
+        parts.append(
+            f"  POS  lat={_fmt(p['latitude_deg'], '.7f')}  "
+            f"lon={_fmt(p['longitude_deg'], '.7f')}  "
+            f"alt={_fmt(p['relative_altitude_m'], '.2f', 'm')}"
+        )
+
+    if "attitude" in data:
+        a = data["attitude"]
+        parts.append(
+            f"  ATT  roll={_fmt(a['roll_deg'], '.2f', '°')}  "
+            f"pitch={_fmt(a['pitch_deg'], '.2f', '°')}  "
+            f"yaw={_fmt(a['yaw_deg'], '.2f', '°')}"
+        )
+
+    if "battery" in data:
+        b = data["battery"]
+        pct = b["remaining_percent"]
+        if _is_number(pct) and pct <= 1:  # a fraction, not yet a percentage
+            pct *= 100
+        parts.append(f"  BAT  {_fmt(pct, '.1f', '%')}  {_fmt(b['voltage_v'], '.2f', 'V')}")
+
+    header = f"[#{count}  {ts}]"
+    return "\n".join([header, *parts, "", ""])
+
+
 def main():
     parser = argparse.ArgumentParser(description="Helios telemetry WebSocket test client")
     parser.add_argument("--host", default="127.0.0.1", help="Server host (default: 127.0.0.1)")
@@ -35,6 +87,22 @@ def main():
         default=["all"],
         help="Telemetry fields to subscribe to (default: all)",
     )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=None,
+        help="Frames per WebSocket message (default: server setting)",
+    )
+    parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="Receive every snapshot; bursts arrive together in one message",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only count frames and print throughput once a second",
+    )
     args = parser.parse_args()
 
     url = f"ws://{args.host}:{args.port}/ws/telemetry"
@@ -49,55 +117,45 @@ def main():
     print("✓ Connected\n")
 
     # Send subscription filter
-    subscribe_msg = json.dumps({"subscribe": args.fields})
-    ws.send(subscribe_msg)
+    subscribe = {"subscribe": args.fields}
+    if args.batch is not None:
+        subscribe["batch"] = args.batch
+    if args.drain:
+        subscribe["batch"] = True
+    ws.send(orjson.dumps(subscribe).decode())
     print(f"  Subscribed to: {', '.join(args.fields)}\n")
-    print("-" * 60)
+    print("-" * 60, flush=True)
 
+    # Frames go straight to the byte stream, flushed once per message
+    out = sys.stdout.buffer
+    count = reported_count = 0
+    started = reported = time.monotonic()
     try:
-        count = 0
         while True:
             raw = ws.recv()
-            data = json.loads(raw)
-            count += 1
-
-            ts = data.get("last_updated", "—")
-            parts = []
-
-            if "position" in data:
-                p = data["position"]
-                parts.append(
-                    f"  POS  lat={p['latitude_deg']}  lon={p['longitude_deg']}  "
-                    f"alt={p['relative_altitude_m']}m"
-                )
-
-            if "attitude" in data:
-                a = data["attitude"]
-                parts.append(
-                    f"  ATT  roll={a['roll_deg']}°  pitch={a['pitch_deg']}°  "
-                    f"yaw={a['yaw_deg']}°"
-                )
-
-            if "battery" in data:
-                b = data["battery"]
-                remaining_percent = b["remaining_percent"]
-                if remaining_percent is None:
-                    pct = "—"
-                elif remaining_percent > 1:  # already in percentage format
-                    pct = f"{remaining_percent:.1f}%"
-                else:
-                    pct = f"{remaining_percent * 100:.1f}%"
-                volts = f"{b['voltage_v']}V" if b["voltage_v"] is not None else "—"
-                parts.append(f"  BAT  {pct}  {volts}")
-
-            header = f"[#{count}  {ts}]"
-            print(header)
-            for line in parts:
-                print(line)
-            print()
+            data = orjson.loads(raw)
+            # Batched messages carry a JSON array of frames
+            frames = data if isinstance(data, list) else [data]
+            if args.quiet:
+                count += len(frames)
+                now = time.monotonic()
+                if now - reported >= 1.0:
+                    rate = (count - reported_count) / (now - reported)
+                    out.write(f"{count} frames  {rate:.0f} frames/s\n".encode())
+                    out.flush()
+                    reported, reported_count = now, count
+                continue
+            chunks = []
+            for frame in frames:
+                count += 1
+                chunks.append(_format_frame(count, frame))
+            out.write("".join(chunks).encode())
+            out.flush()
 
     except KeyboardInterrupt:
-        print(f"\nReceived {count} frames.  Bye!")
+        out.flush()
+        elapsed = time.monotonic() - started
+        print(f"\nReceived {count} frames in {elapsed:.1f}s.  Bye!")
     except WebSocketException as exc:
         print(f"\nWebSocket error: {exc}")
     finally: